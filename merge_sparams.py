@@ -7,15 +7,32 @@ Usage:
 The script scans for CSV files in the input directory, detects prefixes
 like "long", "short", and "thru" in filenames, and merges S-parameter
 columns under names such as long_S11_dB, long_S11_deg, etc.
+
+The output is written by pyarrow. The header and set_id values are only
+quoted when they contain a delimiter, quote or line break. Floats use
+the shortest round-trip form, so integral values have no trailing ".0"
+(1000000000.0 is written as 1000000000). Missing values are empty.
 """
 
 from __future__ import annotations
 
 import argparse
+import contextlib
+import hashlib
+import mmap
+import os
 import re
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from functools import partial
+from itertools import islice
 from pathlib import Path
 
-import pandas as pd
+import numpy as np
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pv
+import pyarrow.parquet as pq
 
 
 PREFIX_PATTERNS = {
@@ -23,85 +40,239 @@ PREFIX_PATTERNS = {
     "short": re.compile(r"short", re.IGNORECASE),
     "thru": re.compile(r"thru", re.IGNORECASE),
 }
+GROUP_PATTERN = re.compile(r"(?P<group>\d+)\.[^.]+$")
+CACHE_KEY = b"merge_sparams.source"
+SPARAM_COLUMNS = {
+    "S11(dB)": "S11_dB",
+    "S11(deg)": "S11_deg",
+    "S21(dB)": "S21_dB",
+    "S21(deg)": "S21_deg",
+    "S12(dB)": "S12_dB",
+    "S12(deg)": "S12_deg",
+    "S22(dB)": "S22_dB",
+    "S22(deg)": "S22_deg",
+}
 
 
-def find_header_index(lines: list[str]) -> int:
-    for idx, line in enumerate(lines):
-        if line.strip().startswith("Freq(Hz)"):
-            return idx
+def find_header_index(path: Path) -> int:
+    # Search the memory-mapped file so only the preamble pages are touched
+    # and nothing proportional to the file size is copied.
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size:
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                offset = mm.find(b"Freq(Hz)")
+                while offset != -1:
+                    line_end = max(mm.rfind(b"\n", 0, offset), mm.rfind(b"\r", 0, offset))
+                    line_start = line_end + 1
+                    if not mm[line_start:offset].strip():
+                        return len(mm[:line_start].splitlines())
+                    offset = mm.find(b"Freq(Hz)", offset + 1)
     raise ValueError("Header line starting with 'Freq(Hz)' not found.")
 
 
-def load_sparams(path: Path, prefix: str) -> pd.DataFrame:
-    lines = path.read_text(encoding="utf-8", errors="ignore").splitlines()
-    header_index = find_header_index(lines)
-    df = pd.read_csv(path, skiprows=header_index)
-
-    expected_cols = [
-        "Freq(Hz)",
-        "S11(dB)",
-        "S11(deg)",
-        "S21(dB)",
-        "S21(deg)",
-        "S12(dB)",
-        "S12(deg)",
-        "S22(dB)",
-        "S22(deg)",
-    ]
-
-    available_cols = [col for col in expected_cols if col in df.columns]
-    if len(available_cols) < len(expected_cols):
+def read_sparams_table(path: Path) -> pa.Table:
+    header_index = find_header_index(path)
+    expected_cols = ["Freq(Hz)", *SPARAM_COLUMNS]
+    read_options = pv.ReadOptions(skip_rows=header_index, use_threads=True)
+    # Parse only the expected columns, as float64, without type inference.
+    convert_options = pv.ConvertOptions(
+        include_columns=expected_cols,
+        column_types=dict.fromkeys(expected_cols, pa.float64()),
+    )
+    try:
+        return pv.read_csv(path, read_options=read_options, convert_options=convert_options)
+    except pa.ArrowKeyError:
+        with pv.open_csv(path, read_options=read_options) as reader:
+            available_cols = reader.schema.names
         missing = sorted(set(expected_cols) - set(available_cols))
-        raise ValueError(f"Missing expected columns in {path.name}: {missing}")
-
-    df = df[expected_cols]
-    rename_map = {
-        "S11(dB)": f"{prefix}_S11_dB",
-        "S11(deg)": f"{prefix}_S11_deg",
-        "S21(dB)": f"{prefix}_S21_dB",
-        "S21(deg)": f"{prefix}_S21_deg",
-        "S12(dB)": f"{prefix}_S12_dB",
-        "S12(deg)": f"{prefix}_S12_deg",
-        "S22(dB)": f"{prefix}_S22_dB",
-        "S22(deg)": f"{prefix}_S22_deg",
-    }
-    return df.rename(columns=rename_map)
+        raise ValueError(f"Missing expected columns in {path.name}: {missing}") from None
+
+
+def read_cached_table(path: Path, cache_dir: Path) -> pa.Table:
+    # Parsed tables are kept as Parquet, tagged with the source file's
+    # mtime and size; a CSV that changed since is parsed again. The cache
+    # is best-effort: unreadable entries or an unwritable cache directory
+    # only cost a re-parse.
+    stat = path.stat()
+    source = f"{stat.st_mtime_ns}:{stat.st_size}".encode()
+    digest = hashlib.sha1(str(path.resolve()).encode()).hexdigest()[:16]
+    cache_path = cache_dir / f"{path.stem}-{digest}.parquet"
+    try:
+        metadata = pq.read_schema(cache_path).metadata or {}
+        if metadata.get(CACHE_KEY) == source:
+            return pq.read_table(cache_path)
+    except (OSError, pa.ArrowException):
+        pass
 
+    table = read_sparams_table(path)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        pq.write_table(table.replace_schema_metadata({CACHE_KEY: source}), tmp_path)
+        os.replace(tmp_path, cache_path)
+    except (OSError, pa.ArrowException):
+        with contextlib.suppress(OSError):
+            tmp_path.unlink(missing_ok=True)
+    return table
 
-def detect_prefix(filename: str) -> str | None:
-    for prefix, pattern in PREFIX_PATTERNS.items():
-        if pattern.search(filename):
-            return prefix
-    return None
 
+def load_sparams(
+    path: Path, prefix: str, cache_dir: Path | None = None
+) -> tuple[np.ndarray, np.ndarray, list[str]]:
+    if cache_dir is None:
+        table = read_sparams_table(path)
+    else:
+        table = read_cached_table(path, cache_dir)
 
-def detect_group(filename: str) -> str:
-    match = re.search(r"(\d+)(?=\.[^.]+$)", filename)
-    return match.group(1) if match else filename
+    freq = table.column("Freq(Hz)").to_numpy()
+    values = np.column_stack([table.column(col).to_numpy() for col in SPARAM_COLUMNS])
+    colnames = [f"{prefix}_{name}" for name in SPARAM_COLUMNS.values()]
+    return freq, values, colnames
 
 
-def merge_group(files: list[Path]) -> pd.DataFrame:
-    merged: pd.DataFrame | None = None
-    for path in files:
-        prefix = detect_prefix(path.name)
-        if not prefix:
-            continue
-        df = load_sparams(path, prefix)
-        if merged is None:
-            merged = df
-        else:
-            merged = merged.merge(df, on="Freq(Hz)", how="outer")
+def group_files(csv_files: list[Path]) -> dict[str, list[tuple[str, Path]]]:
+    # Match prefixes and group ids over all filenames at once with Arrow's
+    # regex kernels. Prefixes are applied in reverse so the first entry in
+    # PREFIX_PATTERNS wins when a name matches several.
+    names = pa.array([path.name for path in csv_files], type=pa.string())
+    prefixes = pa.nulls(len(names), pa.string())
+    for prefix, pattern in reversed(PREFIX_PATTERNS.items()):
+        matched = pc.match_substring_regex(
+            names, pattern.pattern, ignore_case=bool(pattern.flags & re.IGNORECASE)
+        )
+        prefixes = pc.if_else(matched, prefix, prefixes)
+    groups = pc.if_else(
+        pc.match_substring_regex(names, GROUP_PATTERN.pattern),
+        pc.extract_regex(names, GROUP_PATTERN.pattern).field("group"),
+        names,
+    )
 
-    if merged is None:
+    files = pa.table(
+        {"index": pa.array(range(len(names))), "prefix": prefixes, "group": groups}
+    ).filter(pc.is_valid(prefixes))
+    aggregated = files.group_by("group", use_threads=False).aggregate(
+        [("index", "list"), ("prefix", "list")]
+    )
+    return {
+        group: [(prefix, csv_files[index]) for index, prefix in zip(indices, group_prefixes)]
+        for group, indices, group_prefixes in zip(
+            aggregated["group"].to_pylist(),
+            aggregated["index_list"].to_pylist(),
+            aggregated["prefix_list"].to_pylist(),
+        )
+    }
+
+
+def _occurrence(freq: np.ndarray) -> np.ndarray:
+    # For each entry, how many earlier entries share its frequency.
+    order = np.argsort(freq, kind="stable")
+    ordered = freq[order]
+    run_start = np.flatnonzero(np.r_[True, ordered[1:] != ordered[:-1]])
+    run_lengths = np.diff(np.r_[run_start, len(freq)])
+    occurrence = np.empty(len(freq), dtype=np.int64)
+    occurrence[order] = np.arange(len(freq)) - np.repeat(run_start, run_lengths)
+    return occurrence
+
+
+def merge_group(files: list[tuple[str, Path]], cache_dir: Path | None = None) -> pa.Table:
+    if not files:
         raise ValueError("No matching files with long/short/thru prefixes found.")
 
-    return merged
+    by_prefix: dict[str, list[str]] = {}
+    for prefix, path in files:
+        by_prefix.setdefault(prefix, []).append(path.name)
+    conflicts = {prefix: names for prefix, names in by_prefix.items() if len(names) > 1}
+    if conflicts:
+        raise ValueError(f"Several files share a prefix within one group: {conflicts}")
+
+    loaded = [load_sparams(path, prefix, cache_dir) for prefix, path in files]
+    if len(loaded) == 1:
+        # A lone file needs no alignment; keep its rows as recorded.
+        all_freq, values, colnames = loaded[0]
+        columns = values.T
+    else:
+        # Outer-join with plain arrays on (frequency, occurrence) keys, so a
+        # frequency repeated within a file (e.g. a segment boundary) keeps
+        # every row; the n-th copies in different files share a row.
+        keys = [np.column_stack([freq, _occurrence(freq)]) for freq, _, _ in loaded]
+        grid, inverse = np.unique(np.concatenate(keys), axis=0, return_inverse=True)
+        positions = np.split(inverse.reshape(-1), np.cumsum([len(key) for key in keys])[:-1])
+        all_freq = grid[:, 0]
+        columns = np.full((sum(len(names) for _, _, names in loaded), len(grid)), np.nan)
+        colnames = []
+        for (_, values, names), rows in zip(loaded, positions):
+            start = len(colnames)
+            columns[start:start + len(names), rows] = values.T
+            colnames.extend(names)
+
+    arrays = [pa.array(all_freq)] + [pa.array(column, from_pandas=True) for column in columns]
+    return pa.Table.from_arrays(arrays, names=["Freq(Hz)", *colnames])
+
+
+def output_schema(prefixes: set[str]) -> pa.Schema:
+    fields = [pa.field("set_id", pa.string()), pa.field("Freq(Hz)", pa.float64())]
+    for prefix in PREFIX_PATTERNS:
+        if prefix in prefixes:
+            fields.extend(
+                pa.field(f"{prefix}_{name}", pa.float64()) for name in SPARAM_COLUMNS.values()
+            )
+    return pa.schema(fields)
+
+
+def conform_table(table: pa.Table, schema: pa.Schema) -> pa.Table:
+    columns = [
+        table.column(field.name).cast(field.type)
+        if field.name in table.column_names
+        else pa.nulls(table.num_rows, field.type)
+        for field in schema
+    ]
+    return pa.Table.from_arrays(columns, schema=schema)
+
+
+def _merge_worker(
+    item: tuple[str, list[tuple[str, Path]]], schema: pa.Schema, cache_dir: Path | None
+) -> pa.Table:
+    group_id, files = item
+    merged = merge_group(files, cache_dir)
+    merged = merged.add_column(0, "set_id", pa.repeat(group_id, merged.num_rows))
+    return conform_table(merged, schema)
+
+
+def _map_bounded(executor: Executor, func, items, window: int):
+    # Like executor.map, but keeps at most `window` calls in flight, so
+    # finished results never pile up ahead of the consumer.
+    items = iter(items)
+    pending = deque(executor.submit(func, item) for item in islice(items, window))
+    while pending:
+        result = pending.popleft().result()
+        pending.extend(executor.submit(func, item) for item in islice(items, 1))
+        yield result
+
+
+def _write_options(group_ids: list[str]) -> pv.WriteOptions:
+    # Keep the header and set_id bare, as pandas' to_csv did, unless a
+    # group id actually needs quoting ("none" rejects such values).
+    needs_quotes = any(char in group_id for group_id in group_ids for char in ',"\r\n')
+    style = "needed" if needs_quotes else "none"
+    try:
+        return pv.WriteOptions(quoting_style=style, quoting_header="none")
+    except TypeError:  # older pyarrow has no quoting_header
+        return pv.WriteOptions(quoting_style=style)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Merge CPW CSV S-parameter data.")
     parser.add_argument("--input-dir", default=".", help="Directory with CSV files.")
     parser.add_argument("--output", default="merged_sparams.csv", help="Output CSV path.")
+    parser.add_argument(
+        "--jobs", type=int, default=None, help="Worker processes (default: CPU count)."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        default=".cache_sparams",
+        help="Directory for parsed-CSV Parquet cache (default: .cache_sparams).",
+    )
+    parser.add_argument("--no-cache", action="store_true", help="Always parse the CSV files.")
     args = parser.parse_args()
 
     input_dir = Path(args.input_dir)
@@ -109,26 +280,37 @@ def main() -> None:
     if not csv_files:
         raise SystemExit(f"No CSV files found in {input_dir}")
 
-    grouped: dict[str, list[Path]] = {}
-    for path in csv_files:
-        prefix = detect_prefix(path.name)
-        if not prefix:
-            continue
-        group = detect_group(path.name)
-        grouped.setdefault(group, []).append(path)
-
+    grouped = group_files(csv_files)
     if not grouped:
         raise SystemExit("No CSV files matched long/short/thru prefixes.")
 
-    merged_frames = []
-    for group_id, files in sorted(grouped.items()):
-        merged = merge_group(files)
-        merged.insert(0, "set_id", group_id)
-        merged_frames.append(merged)
-
-    output = pd.concat(merged_frames, ignore_index=True)
-    output.to_csv(args.output, index=False)
-    print(f"Wrote {len(output)} rows to {args.output}")
+    # The column set is known from the filenames, so groups can be merged
+    # independently in worker processes and written in order as they finish.
+    schema = output_schema({prefix for files in grouped.values() for prefix, _ in files})
+    jobs = args.jobs or os.cpu_count() or 1
+    cache_dir = None if args.no_cache else Path(args.cache_dir)
+    worker = partial(_merge_worker, schema=schema, cache_dir=cache_dir)
+    n_rows = 0
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        tables = _map_bounded(executor, worker, sorted(grouped.items()), jobs)
+        # Stream into a sibling temporary file so a failing group leaves any
+        # previous output untouched.
+        output = Path(args.output)
+        tmp_path = output.with_name(f".{output.name}.{os.getpid()}.tmp")
+        try:
+            write_options = _write_options(list(grouped))
+            with pv.CSVWriter(tmp_path, schema, write_options=write_options) as writer:
+                for table in tables:
+                    writer.write_table(table)
+                    n_rows += table.num_rows
+            os.replace(tmp_path, output)
+        except BaseException:
+            # Drop queued groups so the error surfaces without merging them.
+            executor.shutdown(cancel_futures=True)
+            raise
+        finally:
+            tmp_path.unlink(missing_ok=True)
+    print(f"Wrote {n_rows} rows to {args.output}")
 
 
 if __name__ == "__main__":
@@ -1,6 +1,78 @@
 #!/usr/bin/env python3
-import random
-from collections import deque
+import numpy as np
+
+try:
+    from numba import njit, prange
+except ImportError:
+    def njit(*args, **kwargs):
+        return lambda func: func
+
+    prange = range
+
+MINE = 1
+REVEALED = 2
+FLAG = 4
+
+# Two-character cell renderings: indices 0-8 are revealed neighbor
+# counts, then hidden, flagged and (when shown) mine cells.
+_SYMBOLS = np.array([f"{symbol:2s}" for symbol in " 12345678.F*"])
+_HIDDEN = 9
+_FLAGGED = 10
+_MINE_SHOWN = 11
+
+
+@njit(cache=True, nogil=True)
+def _push(board, stack, top, idx):
+    if board[idx] & (FLAG | REVEALED):
+        return top
+    board[idx] |= REVEALED
+    stack[top] = idx
+    return top + 1
+
+
+@njit(cache=True, nogil=True)
+def _flood(board, counts, start, stride):
+    # board and counts are the flattened padded grids; the border is
+    # pre-marked REVEALED, so neighbor offsets need no bounds checks.
+    # Cells are marked on push, so each one enters the stack at most once.
+    stack = np.empty(board.size, dtype=np.int32)
+    top = _push(board, stack, 0, start)
+    revealed = 0
+    while top > 0:
+        top -= 1
+        revealed += 1
+        idx = stack[top]
+        if counts[idx] != 0:
+            continue
+        top = _push(board, stack, top, idx - stride - 1)
+        top = _push(board, stack, top, idx - stride)
+        top = _push(board, stack, top, idx - stride + 1)
+        top = _push(board, stack, top, idx - 1)
+        top = _push(board, stack, top, idx + 1)
+        top = _push(board, stack, top, idx + stride - 1)
+        top = _push(board, stack, top, idx + stride)
+        top = _push(board, stack, top, idx + stride + 1)
+    return revealed
+
+
+@njit(cache=True, nogil=True, parallel=True)
+def _flood_batch(boards, counts, starts, stride, revealed):
+    for b in prange(boards.shape[0]):
+        revealed[b] = _flood(boards[b], counts[b], starts[b], stride)
+
+
+def _neighbor_counts(board):
+    # board is padded by one cell on the last two axes; any leading axes
+    # are independent boards.
+    padded = (board & MINE).astype(np.int8)
+    mines = padded[..., 1:-1, 1:-1]
+    rows, cols = mines.shape[-2:]
+    counts = np.zeros_like(mines)
+    for dr in range(3):
+        for dc in range(3):
+            counts += padded[..., dr:dr + rows, dc:dc + cols]
+    # Mine cells keep a count of 0; for the rest the centre term is 0 anyway.
+    return np.where(mines, 0, counts)
 
 
 class Minesweeper:
@@ -12,27 +84,30 @@ class Minesweeper:
         self.rows = rows
         self.cols = cols
         self.mine_count = mine_count
-        self.mines = set()
-        self.revealed = set()
-        self.flags = set()
-        self.neighbor_counts = {}
+        # Padded by one cell on every side; state and counts are views of
+        # the interior so callers keep using (row, col) coordinates.
+        self._board = np.full((rows + 2, cols + 2), REVEALED, dtype=np.uint8)
+        self._board[1:-1, 1:-1] = 0
+        self._counts = np.zeros((rows + 2, cols + 2), dtype=np.int8)
+        self.state = self._board[1:-1, 1:-1]
+        self.counts = self._counts[1:-1, 1:-1]
+        self.revealed_count = 0
         self._place_mines()
         self._compute_neighbor_counts()
+        # Trigger JIT compilation now rather than on the first move.
+        warmup = np.full(9, REVEALED, dtype=np.uint8)
+        warmup[4] = 0
+        _flood(warmup, np.zeros(9, dtype=np.int8), 4, 3)
+        self._header = "   " + " ".join(f"{c:2d}" for c in range(cols))
+        self._row_labels = [f"{r:2d} " for r in range(rows)]
 
     def _place_mines(self):
-        choices = random.sample(range(self.rows * self.cols), self.mine_count)
-        for idx in choices:
-            row = idx // self.cols
-            col = idx % self.cols
-            self.mines.add((row, col))
+        rng = np.random.default_rng()
+        choices = rng.choice(self.rows * self.cols, self.mine_count, replace=False)
+        self.state[np.unravel_index(choices, self.state.shape)] |= MINE
 
     def _compute_neighbor_counts(self):
-        for row in range(self.rows):
-            for col in range(self.cols):
-                if (row, col) in self.mines:
-                    continue
-                count = sum((nr, nc) in self.mines for nr, nc in self.neighbors(row, col))
-                self.neighbor_counts[(row, col)] = count
+        self.counts[:] = _neighbor_counts(self._board)
 
     def neighbors(self, row, col):
         for dr in (-1, 0, 1):
@@ -45,53 +120,109 @@ class Minesweeper:
                     yield nr, nc
 
     def reveal(self, row, col):
-        if (row, col) in self.flags or (row, col) in self.revealed:
+        state = self.state
+        if state[row, col] & (FLAG | REVEALED):
             return True
-        if (row, col) in self.mines:
-            self.revealed.add((row, col))
+        if state[row, col] & MINE:
+            state[row, col] |= REVEALED
+            self.revealed_count += 1
             return False
-        queue = deque([(row, col)])
-        while queue:
-            cr, cc = queue.popleft()
-            if (cr, cc) in self.revealed or (cr, cc) in self.flags:
-                continue
-            self.revealed.add((cr, cc))
-            if self.neighbor_counts.get((cr, cc), 0) == 0:
-                for nr, nc in self.neighbors(cr, cc):
-                    if (nr, nc) not in self.revealed and (nr, nc) not in self.flags:
-                        queue.append((nr, nc))
+        stride = self.cols + 2
+        start = (row + 1) * stride + col + 1
+        self.revealed_count += _flood(
+            self._board.reshape(-1), self._counts.reshape(-1), start, stride
+        )
         return True
 
     def toggle_flag(self, row, col):
-        if (row, col) in self.revealed:
+        if self.state[row, col] & REVEALED:
             return
-        if (row, col) in self.flags:
-            self.flags.remove((row, col))
-        else:
-            self.flags.add((row, col))
+        self.state[row, col] ^= FLAG
 
     def is_won(self):
-        return len(self.revealed) == self.rows * self.cols - self.mine_count
+        return self.revealed_count == self.rows * self.cols - self.mine_count
 
     def display(self, show_mines=False):
-        header = "   " + " ".join(f"{c:2d}" for c in range(self.cols))
-        lines = [header]
-        for r in range(self.rows):
-            row_cells = []
-            for c in range(self.cols):
-                cell = (r, c)
-                if show_mines and cell in self.mines:
-                    symbol = "*"
-                elif cell in self.revealed:
-                    count = self.neighbor_counts.get(cell, 0)
-                    symbol = str(count) if count > 0 else " "
-                elif cell in self.flags:
-                    symbol = "F"
-                else:
-                    symbol = "."
-                row_cells.append(f"{symbol:2s}")
-            lines.append(f"{r:2d} " + "".join(row_cells))
-        return "\n".join(lines)
+        state = self.state
+        hidden = np.where(state & FLAG, _FLAGGED, _HIDDEN)
+        codes = np.where(state & REVEALED, self.counts, hidden)
+        if show_mines:
+            codes = np.where(state & MINE, _MINE_SHOWN, codes)
+        # Every symbol is exactly two characters, so viewing each contiguous
+        # row as one wide string joins its cells without a Python loop.
+        rows = _SYMBOLS[codes].view(f"<U{2 * self.cols}").ravel().tolist()
+        lines = [label + row for label, row in zip(self._row_labels, rows)]
+        return "\n".join([self._header, *lines])
+
+
+class BatchMinesweeper:
+    """Many independent boards of one shape, played in lockstep.
+
+    Meant for solver training and Monte Carlo runs: every call takes one
+    move per board and returns per-board results as arrays.
+    """
+
+    def __init__(self, boards, rows, cols, mine_count):
+        if boards <= 0:
+            raise ValueError("boards must be positive")
+        if rows <= 0 or cols <= 0:
+            raise ValueError("rows and cols must be positive")
+        if mine_count <= 0 or mine_count >= rows * cols:
+            raise ValueError("mine_count must be between 1 and rows*cols - 1")
+        self.boards = boards
+        self.rows = rows
+        self.cols = cols
+        self.mine_count = mine_count
+        # Same padded layout as Minesweeper, with a leading board axis.
+        shape = (boards, rows + 2, cols + 2)
+        self._board = np.full(shape, REVEALED, dtype=np.uint8)
+        self._board[:, 1:-1, 1:-1] = 0
+        self._counts = np.zeros(shape, dtype=np.int8)
+        self.state = self._board[:, 1:-1, 1:-1]
+        self.counts = self._counts[:, 1:-1, 1:-1]
+        self.revealed_count = np.zeros(boards, dtype=np.int64)
+        self._place_mines()
+        self.counts[:] = _neighbor_counts(self._board)
+
+    def _place_mines(self):
+        rng = np.random.default_rng()
+        layout = np.zeros((self.boards, self.rows * self.cols), dtype=np.uint8)
+        layout[:, :self.mine_count] = MINE
+        self.state |= rng.permuted(layout, axis=1).reshape(self.state.shape)
+
+    def _cells(self, rows, cols):
+        index = np.arange(self.boards)
+        rows = np.broadcast_to(rows, (self.boards,))
+        cols = np.broadcast_to(cols, (self.boards,))
+        return index, rows, cols
+
+    def reveal(self, rows, cols):
+        index, rows, cols = self._cells(rows, cols)
+        cells = self.state[index, rows, cols]
+        hit = (cells & MINE != 0) & (cells & (FLAG | REVEALED) == 0)
+        self.state[index[hit], rows[hit], cols[hit]] |= REVEALED
+        stride = self.cols + 2
+        starts = (rows + 1) * stride + cols + 1
+        # Padded index 0 is a border cell, so boards that hit a mine skip the fill.
+        starts[hit] = 0
+        revealed = np.zeros(self.boards, dtype=np.int64)
+        _flood_batch(
+            self._board.reshape(self.boards, -1),
+            self._counts.reshape(self.boards, -1),
+            starts,
+            stride,
+            revealed,
+        )
+        self.revealed_count += revealed + hit
+        return ~hit
+
+    def toggle_flag(self, rows, cols):
+        index, rows, cols = self._cells(rows, cols)
+        cells = self.state[index, rows, cols]
+        self.state[index, rows, cols] = np.where(cells & REVEALED, cells, cells ^ FLAG)
+
+    def is_won(self):
+        return self.revealed_count == self.rows * self.cols - self.mine_count
 
 
 def parse_dimensions(text, default):
@@ -0,0 +1,74 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from merge_sparams import merge_group, read_cached_table
+
+HEADER = "Freq(Hz),S11(dB),S11(deg),S21(dB),S21(deg),S12(dB),S12(deg),S22(dB),S22(deg)"
+
+
+class MergeGroupTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.dir = Path(self._tmp.name)
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def write(self, name, rows):
+        """Write a sweep whose S-parameter columns all hold the row's tag."""
+        lines = ["!preamble", HEADER]
+        lines += [",".join([f"{freq:g}"] + [str(tag)] * 8) for freq, tag in rows]
+        path = self.dir / name
+        path.write_text("\n".join(lines) + "\n")
+        return path
+
+    def test_single_unsorted_file_keeps_rows(self):
+        path = self.write("thru_1.csv", [(2e9, 2), (1e9, 1), (3e9, 3)])
+        table = merge_group([("thru", path)])
+        self.assertEqual(table["Freq(Hz)"].to_pylist(), [2e9, 1e9, 3e9])
+        self.assertEqual(table["thru_S21_dB"].to_pylist(), [2, 1, 3])
+
+    def test_single_descending_file(self):
+        path = self.write("thru_1.csv", [(3e9, 3), (2e9, 2), (1e9, 1)])
+        table = merge_group([("thru", path)])
+        self.assertEqual(table["thru_S11_dB"].to_pylist(), [3, 2, 1])
+
+    def test_unsorted_files_align_on_sorted_grid(self):
+        long_path = self.write("long_1.csv", [(2e9, 20), (1e9, 10)])
+        thru_path = self.write("thru_1.csv", [(3e9, 3), (1e9, 1)])
+        table = merge_group([("long", long_path), ("thru", thru_path)])
+        self.assertEqual(table["Freq(Hz)"].to_pylist(), [1e9, 2e9, 3e9])
+        self.assertEqual(table["long_S11_dB"].to_pylist(), [10, 20, None])
+        self.assertEqual(table["thru_S11_dB"].to_pylist(), [1, None, 3])
+
+    def test_single_file_keeps_repeated_frequency(self):
+        rows = [(1e9, 1), (2e9, 2), (2e9, 3), (3e9, 4)]
+        path = self.write("long_1.csv", rows)
+        table = merge_group([("long", path)])
+        self.assertEqual(table["Freq(Hz)"].to_pylist(), [1e9, 2e9, 2e9, 3e9])
+        self.assertEqual(table["long_S11_dB"].to_pylist(), [1, 2, 3, 4])
+
+    def test_repeated_frequency_aligns_by_occurrence(self):
+        long_path = self.write("long_1.csv", [(1e9, 1), (1e9, 2), (2e9, 3)])
+        thru_path = self.write("thru_1.csv", [(2e9, 30), (1e9, 10)])
+        table = merge_group([("long", long_path), ("thru", thru_path)])
+        self.assertEqual(table["Freq(Hz)"].to_pylist(), [1e9, 1e9, 2e9])
+        self.assertEqual(table["long_S11_dB"].to_pylist(), [1, 2, 3])
+        self.assertEqual(table["thru_S11_dB"].to_pylist(), [10, None, 30])
+
+    def test_unusable_cache_falls_back_to_parsing(self):
+        path = self.write("thru_1.csv", [(1e9, 1)])
+        cache_dir = self.dir / "cache"
+        cache_dir.mkdir()
+        table = read_cached_table(path, cache_dir)
+        for entry in cache_dir.iterdir():
+            entry.write_text("not parquet")
+        self.assertTrue(read_cached_table(path, cache_dir).equals(table))
+        blocked = self.dir / "blocked"
+        blocked.write_text("a file, not a directory")
+        self.assertTrue(read_cached_table(path, blocked / "cache").equals(table))
+
+
+if __name__ == "__main__":
+    unittest.main()